@@ -1,3 +1,4 @@
+import os
 import json
 import joblib
 import base64
@@ -5,6 +6,7 @@ import pandas as pd
 import streamlit as st
 from tensorflow import keras
 from pathlib import Path
+from uncertainty import mc_dropout_predict
 
 # -----------------------------------------------------------------------------
 # 1. PAGE CONFIG & ASSETS
@@ -19,24 +21,31 @@ st.set_page_config(
 # -----------------------------------------------------------------------------
 # 2. HELPER FUNCTIONS
 # -----------------------------------------------------------------------------
+@st.cache_data
 def get_base64_image(image_path: str) -> str:
-    """Convert image to base64 for embedding in HTML."""
+    """Convert image to base64 for embedding in HTML (read once per process)."""
     try:
         with open(image_path, "rb") as img_file:
             return base64.b64encode(img_file.read()).decode()
     except FileNotFoundError:
         return ""
 
-# Load banana images as base64
-banana_fail_b64 = get_base64_image("assets/banana_fail.png")
-banana_mid_b64 = get_base64_image("assets/banana_mid.png")
-banana_success_b64 = get_base64_image("assets/banana_success.png")
+# Banana mascots are passed to st.image by path, so Streamlit serves them as
+# media files and a result rerun only sends their URL.
+BANANA_IMAGES = {
+    "fail": "assets/banana_fail.png",
+    "mid": "assets/banana_mid.png",
+    "success": "assets/banana_success.png",
+}
 header_banner_b64 = get_base64_image("assets/header_banner.png")
 
 # -----------------------------------------------------------------------------
 # 3. CUSTOM CSS (THEME: WARM WHITE / CREAM / GLASS)
 # -----------------------------------------------------------------------------
-st.markdown(f"""
+@st.cache_resource
+def get_theme_css() -> str:
+    """Build the theme stylesheet once per process instead of on every rerun."""
+    return f"""
 <style>
     /* GOOGLE FONTS */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=Outfit:wght@400;500;600;700&display=swap');
@@ -392,11 +401,14 @@ st.markdown(f"""
         color: #1E8449;
     }}
     
-    .banana-mascot {{
-        width: 180px;
-        height: 180px;
-        margin: 0 auto 20px auto;
-        display: block;
+    /* Banana mascot (st.image above the result card) */
+    [data-testid="stImage"] {{
+        display: flex;
+        justify-content: center;
+        margin: 0 auto -10px auto;
+    }}
+    
+    [data-testid="stImage"] img {{
         animation: float 3s ease-in-out infinite;
     }}
     
@@ -529,9 +541,9 @@ st.markdown(f"""
         .result-score {{
             font-size: 3rem;
         }}
-        .banana-mascot {{
-            width: 140px;
-            height: 140px;
+        [data-testid="stImage"] img {{
+            width: 140px !important;
+            height: 140px !important;
         }}
         .social-links {{
             flex-direction: column;
@@ -541,14 +553,24 @@ st.markdown(f"""
 </style>
 
 <div class="nano-banana">🍌</div>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(get_theme_css(), unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
 # 4. BACKEND LOGIC (CACHED)
 # -----------------------------------------------------------------------------
+# "ann" (default) serves the Keras model alone; "ensemble" serves
+# ensemble.EnsemblePredictor with the cascade policy (run
+# `python ensemble.py fit` first).
+MODEL_MODE = os.environ.get("ORACLE_MODEL", "ann")
+
 @st.cache_resource
-def load_artifacts():
+def load_artifacts(mode: str = "ann"):
     try:
+        if mode == "ensemble":
+            from ensemble import load_ensemble_artifacts
+            return load_ensemble_artifacts()
         model = keras.models.load_model("student_grade_ann_best.keras")
         preprocessor = joblib.load("preprocessor.joblib")
         with open("feature_columns.json", "r") as f:
@@ -558,7 +580,10 @@ def load_artifacts():
         st.error(f"⚠️ Could not load model files. Please ensure all required files are in the directory. Error: {e}")
         return None, None, None
 
-model, preprocessor, FEATURE_COLS = load_artifacts()
+model, preprocessor, FEATURE_COLS = load_artifacts(MODEL_MODE)
+
+# Stochastic forward passes for the optional confidence estimate
+MC_SAMPLES = 50
 
 DEFAULT_NUM = 0
 DEFAULT_CAT = "no"
@@ -629,138 +654,164 @@ st.markdown("""
 st.markdown('<hr class="custom-divider">', unsafe_allow_html=True)
 
 # Main Logic Block
-if model:
-    # --- GLASS CONTAINER FOR INPUTS ---
-    st.markdown('<div class="glass-card-elevated">', unsafe_allow_html=True)
-    st.markdown("""
-    <div class="section-title">
-        <span class="section-icon">📝</span>
-        Student Profile
+def render_result(pred: float, mc: dict = None):
+    """Result card for one prediction, plus band probabilities if `mc` is given."""
+    # Determine result category
+    if pred < 10:
+        result_class = "fail"
+        score_class = "result-score-fail"
+        verdict_class = "verdict-fail"
+        verdict_text = "💔 Needs Improvement - Time to step up!"
+    elif pred < 14:
+        result_class = "mid"
+        score_class = "result-score-mid"
+        verdict_class = "verdict-mid"
+        verdict_text = "🌟 Passing - You're on the right track!"
+    else:
+        result_class = "success"
+        score_class = "result-score-success"
+        verdict_class = "verdict-success"
+        verdict_text = "🏆 Excellent - You're crushing it!"
+
+    # Display Result Card
+    if Path(BANANA_IMAGES[result_class]).exists():
+        st.image(BANANA_IMAGES[result_class], width=180)
+    st.markdown(f"""
+    <div class="result-card result-{result_class}">
+        <h3 style="color: #6B6560; font-size: 1.1rem; font-weight: 500; margin: 0;">Predicted Grade</h3>
+        <div class="result-score {score_class}">{pred:.1f}<span class="result-max"> / 20</span></div>
+        <div class="result-verdict {verdict_class}">{verdict_text}</div>
     </div>
     """, unsafe_allow_html=True)
-    
-    with st.form("student_form"):
-        user = {}
-        
-        # Row 1 - Identity & Subject
-        c1, c2 = st.columns(2)
-        with c1:
-            if "sex" in FEATURE_COLS:
-                user["sex"] = st.selectbox("👤 Gender", ["F", "M"], help="Select your gender")
-            if "age" in FEATURE_COLS:
-                user["age"] = st.slider("🎂 Age", 15, 22, 17)
-        with c2:
-            if "subject" in FEATURE_COLS:
-                user["subject"] = st.selectbox("📚 Subject", ["math", "portuguese"])
-            if "studytime" in FEATURE_COLS:
-                user["studytime"] = st.select_slider(
-                    "⏰ Weekly Study Hours", 
-                    options=[1, 2, 3, 4], 
-                    value=2,
-                    format_func=lambda x: {
-                        1: "< 2 hours", 
-                        2: "2-5 hours", 
-                        3: "5-10 hours", 
-                        4: "> 10 hours"
-                    }[x]
-                )
 
-        # Row 2 - Academic History
-        st.markdown("<br>", unsafe_allow_html=True)
-        c3, c4 = st.columns(2)
-        with c3:
-            if "failures" in FEATURE_COLS:
-                user["failures"] = st.number_input("❌ Past Failures", 0, 4, 0, help="Number of past class failures")
-        with c4:
-            if "absences" in FEATURE_COLS:
-                user["absences"] = st.number_input("🏃 Absences", 0, 99, 3, help="Number of school absences")
-
-        # Row 3 - Lifestyle Toggles
-        st.markdown("<br>", unsafe_allow_html=True)
-        st.markdown("**🎯 Additional Factors**", unsafe_allow_html=True)
-        
-        t1, t2, t3, t4 = st.columns(4)
-        
-        with t1:
-            if "schoolsup" in FEATURE_COLS:
-                user["schoolsup"] = "yes" if st.toggle("📖 Extra Classes", help="Extra educational support") else "no"
-        with t2:
-            if "internet" in FEATURE_COLS:
-                user["internet"] = "yes" if st.toggle("🌐 Internet Access", value=True, help="Home internet access") else "no"
-        with t3:
-            if "romantic" in FEATURE_COLS:
-                user["romantic"] = "yes" if st.toggle("💕 Relationship", help="In a romantic relationship") else "no"
-        with t4:
-            if "famsup" in FEATURE_COLS:
-                user["famsup"] = "yes" if st.toggle("👨‍👩‍👧 Family Support", value=True, help="Family educational support") else "no"
-
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        submitted = st.form_submit_button("🔮 Reveal My Grade")
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # --- RESULT SECTION ---
-    if submitted:
+    # Progress visualization
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.progress(min(max(pred / 20, 0.0), 1.0))
+
+    # Confidence (Monte Carlo dropout)
+    if mc is not None:
+        st.caption(
+            f"🎲 Uncertainty: ± {float(mc['std'][0]):.1f} grade points "
+            f"(mean {float(mc['mean'][0]):.1f} over {MC_SAMPLES} stochastic passes)"
+        )
+        b1, b2, b3 = st.columns(3)
+        b1.metric("💔 Fail (< 10)", f"{float(mc['p_fail'][0]):.0%}")
+        b2.metric("🌟 Pass (10-14)", f"{float(mc['p_mid'][0]):.0%}")
+        b3.metric("🏆 Excellent (14+)", f"{float(mc['p_success'][0]):.0%}")
+
+
+
+@st.fragment
+def prediction_panel():
+    """
+    Form + result card. Submitting the form reruns only this fragment, so the
+    theme CSS, hero and footer markup above/below are not rebuilt or re-sent.
+    """
+    with st.container():
+        # --- GLASS CONTAINER FOR INPUTS ---
+        st.markdown('<div class="glass-card-elevated">', unsafe_allow_html=True)
+        st.markdown("""
+        <div class="section-title">
+            <span class="section-icon">📝</span>
+            Student Profile
+        </div>
+        """, unsafe_allow_html=True)
+
+        with st.form("student_form"):
+            user = {}
+
+            # Row 1 - Identity & Subject
+            c1, c2 = st.columns(2)
+            with c1:
+                if "sex" in FEATURE_COLS:
+                    user["sex"] = st.selectbox("👤 Gender", ["F", "M"], help="Select your gender")
+                if "age" in FEATURE_COLS:
+                    user["age"] = st.slider("🎂 Age", 15, 22, 17)
+            with c2:
+                if "subject" in FEATURE_COLS:
+                    user["subject"] = st.selectbox("📚 Subject", ["math", "portuguese"])
+                if "studytime" in FEATURE_COLS:
+                    user["studytime"] = st.select_slider(
+                        "⏰ Weekly Study Hours", 
+                        options=[1, 2, 3, 4], 
+                        value=2,
+                        format_func=lambda x: {
+                            1: "< 2 hours", 
+                            2: "2-5 hours", 
+                            3: "5-10 hours", 
+                            4: "> 10 hours"
+                        }[x]
+                    )
+
+            # Row 2 - Academic History
+            st.markdown("<br>", unsafe_allow_html=True)
+            c3, c4 = st.columns(2)
+            with c3:
+                if "failures" in FEATURE_COLS:
+                    user["failures"] = st.number_input("❌ Past Failures", 0, 4, 0, help="Number of past class failures")
+            with c4:
+                if "absences" in FEATURE_COLS:
+                    user["absences"] = st.number_input("🏃 Absences", 0, 99, 3, help="Number of school absences")
+
+            # Row 3 - Lifestyle Toggles
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("**🎯 Additional Factors**", unsafe_allow_html=True)
+
+            t1, t2, t3, t4 = st.columns(4)
+
+            with t1:
+                if "schoolsup" in FEATURE_COLS:
+                    user["schoolsup"] = "yes" if st.toggle("📖 Extra Classes", help="Extra educational support") else "no"
+            with t2:
+                if "internet" in FEATURE_COLS:
+                    user["internet"] = "yes" if st.toggle("🌐 Internet Access", value=True, help="Home internet access") else "no"
+            with t3:
+                if "romantic" in FEATURE_COLS:
+                    user["romantic"] = "yes" if st.toggle("💕 Relationship", help="In a romantic relationship") else "no"
+            with t4:
+                if "famsup" in FEATURE_COLS:
+                    user["famsup"] = "yes" if st.toggle("👨‍👩‍👧 Family Support", value=True, help="Family educational support") else "no"
+
+            st.markdown("<br>", unsafe_allow_html=True)
+            show_confidence = st.toggle("🎲 Show Confidence", help="Estimate uncertainty with Monte Carlo dropout")
+
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            submitted = st.form_submit_button("🔮 Reveal My Grade")
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # --- RESULT SECTION ---
+        if not submitted:
+            return
+
         x = build_input_row(user)
-    
         if x.empty:
             st.error("⚠️ Could not build input row. Please try again.")
-        else:
-            st.write("🔍 Debug – input to model:")
-            st.write("Columns:", list(x.columns))
-            st.write(x.dtypes)
-    
-            with st.spinner("✨ The Oracle is analyzing your fate..."):
-                try:
-                    x_p = preprocessor.transform(x)
-                    x_p = x_p.toarray() if hasattr(x_p, "toarray") else x_p
-                    pred = float(model.predict(x_p, verbose=0).flatten()[0])
-                except Exception as e:
-                    st.error(
-                        "⚠️ Something went wrong while preparing your data for the model. "
-                        "Check that all required inputs are present and valid."
-                    )
-                    st.code(str(e))
-                    st.stop()
-
-
-        # Determine result category
-        if pred < 10:
-            result_class = "fail"
-            score_class = "result-score-fail"
-            verdict_class = "verdict-fail"
-            verdict_text = "💔 Needs Improvement - Time to step up!"
-            banana_img = banana_fail_b64
-        elif pred < 14:
-            result_class = "mid"
-            score_class = "result-score-mid"
-            verdict_class = "verdict-mid"
-            verdict_text = "🌟 Passing - You're on the right track!"
-            banana_img = banana_mid_b64
-        else:
-            result_class = "success"
-            score_class = "result-score-success"
-            verdict_class = "verdict-success"
-            verdict_text = "🏆 Excellent - You're crushing it!"
-            banana_img = banana_success_b64
-
-        # Display Result Card
-        st.markdown(f"""
-        <div class="result-card result-{result_class}">
-            <img src="data:image/png;base64,{banana_img}" class="banana-mascot" alt="Banana Mascot">
-            <h3 style="color: #6B6560; font-size: 1.1rem; font-weight: 500; margin: 0;">Predicted Grade</h3>
-            <div class="result-score {score_class}">{pred:.1f}<span class="result-max"> / 20</span></div>
-            <div class="result-verdict {verdict_class}">{verdict_text}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Progress visualization
-        st.markdown("<br>", unsafe_allow_html=True)
-        st.progress(min(pred/20, 1.0))
-        
-        # Detailed breakdown
-        with st.expander("📊 View Input Details"):
-            st.dataframe(x, use_container_width=True)
+            return
+
+        with st.spinner("✨ The Oracle is analyzing your fate..."):
+            try:
+                x_p = preprocessor.transform(x)
+                x_p = x_p.toarray() if hasattr(x_p, "toarray") else x_p
+                pred = float(model.predict(x_p, verbose=0).flatten()[0])
+                # The card and verdict always use the deterministic prediction;
+                # Monte Carlo dropout only adds spread and band probabilities.
+                # In ensemble mode the dropout spread comes from its ANN member.
+                ann = getattr(model, "ann", model)
+                mc = mc_dropout_predict(ann, x_p, k=MC_SAMPLES) if show_confidence else None
+            except Exception as e:
+                st.error(
+                    "⚠️ Something went wrong while preparing your data for the model. "
+                    "Check that all required inputs are present and valid."
+                )
+                st.code(str(e))
+                return
+
+        render_result(pred, mc)
+
+
+if model:
+    prediction_panel()
 
 # -----------------------------------------------------------------------------
 # 6. FOOTER
@@ -0,0 +1,144 @@
+"""
+In-process ESTIMATE of per-submit rerun cost for app.py.
+
+Drives the app headlessly with Streamlit's AppTest (no `streamlit run`
+server, no browser, no websocket) and reports, per submit:
+- full-script rerun time, and the time spent executing the fragment body
+- element proto bytes: summed serialized size of the rendered elements
+
+Both fragment numbers are PROXIES. AppTest reruns the whole script on every
+`.click().run()`, so "fragment exec time" is the fragment's share of that full
+run, not a separately measured fragment rerun. Element proto bytes are not
+websocket bytes (no ForwardMsg framing, compression or deduplication). Use
+the numbers to compare revisions, not as what a browser session sees.
+
+`--baseline-rev` is required and must point at an app.py from before the
+form moved into `st.fragment`, i.e. the parent of the commit that added it.
+
+Usage:
+    python bench_app_rerun.py --submits 20 \
+        --baseline-rev "$(git log --format=%h -S '@st.fragment' -- app.py | tail -1)~1"
+"""
+import argparse
+import functools
+import os
+import subprocess
+import time
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+BASELINE_SCRIPT = ".bench_app_baseline.py"
+
+_real_fragment = st.fragment
+FRAGMENT_TIMES = []
+
+
+def _timed_fragment(func=None, **kwargs):
+    """Wrap st.fragment so each fragment execution records its duration."""
+    if func is None:
+        return lambda f: _timed_fragment(f, **kwargs)
+
+    @functools.wraps(func)
+    def timed(*args, **kw):
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kw)
+        finally:
+            FRAGMENT_TIMES.append(time.perf_counter() - t0)
+
+    return _real_fragment(timed, **kwargs)
+
+
+def _proto_bytes(node):
+    total = 0
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "SerializeToString"):
+        total += len(proto.SerializeToString())
+    for child in getattr(node, "children", {}).values():
+        total += _proto_bytes(child)
+    return total
+
+
+def _has_form(node):
+    if getattr(node, "type", None) == "form":
+        return True
+    return any(_has_form(c) for c in getattr(node, "children", {}).values())
+
+
+def _submit_button(at):
+    for button in at.button:
+        if "Reveal" in str(button.label):
+            return button
+    raise RuntimeError("Could not find the form submit button")
+
+
+def bench_script(path, submits, timeout):
+    """Returns per-submit (script seconds, fragment exec seconds, total proto bytes, fragment proto bytes)."""
+    at = AppTest.from_file(path, default_timeout=timeout)
+    at.run()  # cold start: model load, asset reads, cache fill
+    if at.exception:
+        raise RuntimeError(f"{path} raised during startup: {at.exception}")
+
+    rows = []
+    for _ in range(submits):
+        FRAGMENT_TIMES.clear()
+        t0 = time.perf_counter()
+        _submit_button(at).click().run()
+        script_s = time.perf_counter() - t0
+
+        fragment = next((c for c in at.main.children.values() if _has_form(c)), None)
+        rows.append((
+            script_s,
+            sum(FRAGMENT_TIMES) if FRAGMENT_TIMES else None,
+            _proto_bytes(at.main),
+            _proto_bytes(fragment) if FRAGMENT_TIMES and fragment is not None else None,
+        ))
+    return rows
+
+
+def summarize(name, rows):
+    script = np.array([r[0] for r in rows]) * 1000
+    total_bytes = np.mean([r[2] for r in rows])
+    print(f"\n{name}")
+    print(f"  {'':<22} {'p50 ms':>8}  {'p95 ms':>8}  {'element proto KiB':>17}")
+    print(f"  {'full-script rerun':<22} {np.median(script):>8.1f}  {np.percentile(script, 95):>8.1f}"
+          f"  {total_bytes / 1024:>17.1f}")
+    if rows[0][1] is not None:
+        frag = np.array([r[1] for r in rows]) * 1000
+        frag_bytes = np.mean([r[3] for r in rows])
+        print(f"  {'fragment exec time':<22} {np.median(frag):>8.1f}  {np.percentile(frag, 95):>8.1f}"
+              f"  {frag_bytes / 1024:>17.1f}")
+        print("  (estimate: fragment share of a full AppTest rerun; proto bytes != websocket bytes)")
+    else:
+        print("  (no fragment: every submit reruns the full script)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app.py rerun cost per form submission.")
+    parser.add_argument("--submits", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout per run (seconds)")
+    parser.add_argument("--baseline-rev", required=True,
+                        help="git revision of app.py from before the st.fragment change")
+    args = parser.parse_args()
+
+    st.fragment = _timed_fragment
+
+    source = subprocess.run(
+        ["git", "show", f"{args.baseline_rev}:app.py"], check=True, capture_output=True
+    ).stdout
+    if b"st.fragment" in source:
+        parser.error(f"app.py @ {args.baseline_rev} already uses st.fragment; pass the revision before that change")
+    with open(BASELINE_SCRIPT, "wb") as f:
+        f.write(source)
+    try:
+        summarize(f"app.py @ {args.baseline_rev}", bench_script(BASELINE_SCRIPT, args.submits, args.timeout))
+    finally:
+        os.remove(BASELINE_SCRIPT)
+
+    summarize("app.py (working tree)", bench_script("app.py", args.submits, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
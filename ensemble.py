@@ -0,0 +1,209 @@
+"""
+Ensemble serving: LinearRegression + RandomForest + ANN behind one interface.
+
+main.ipynb trains all three models but only ships the ANN. This module:
+
+- fits the two sklearn members on the notebook's training split, reusing the
+  saved `preprocessor.joblib` so every member reads the SAME preprocessed matrix
+- wraps them in `EnsemblePredictor`, which exposes the same
+  `predict(x_p, verbose=0)` call app.py already makes on the Keras model
+- evaluates members in parallel and supports cost-aware routing: answer from
+  the two cheap members (linear, ANN), escalate to the forest / full ensemble
+  only when they disagree
+
+Usage:
+    python ensemble.py fit          # train + save ensemble_members.joblib
+    python ensemble.py report       # accuracy + latency per routing policy
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from tensorflow import keras
+
+from student_data import (
+    FEATURE_COLS_PATH, MODEL_PATH, PREPROCESSOR_PATH, SEED, load_base_split, to_dense,
+)
+
+MEMBERS_PATH = "ensemble_members.joblib"
+
+POLICIES = ("linear", "forest", "ann", "ensemble", "cascade")
+
+
+# -----------------------------------------------------------------------------
+# 1. ENSEMBLE PREDICTOR
+# -----------------------------------------------------------------------------
+class EnsemblePredictor:
+    """
+    Drop-in replacement for the Keras model returned by `load_artifacts`.
+
+    Per-row cost, cheapest first: linear (one dot product) -> ann (direct
+    call, three small Dense layers) -> forest (400 trees walked serially).
+    `python ensemble.py report` prints the measured per-row latency of each
+    member, so the ordering can be checked on the serving machine. Policies:
+    - "linear" / "forest" / "ann": a single member
+    - "ensemble": mean of all members, evaluated in parallel
+    - "cascade": run linear + ann side by side; rows where they agree within
+      `threshold` grade points get the mean of the two, the rest escalate to
+      `escalate_to` ("forest" or "ensemble")
+
+    The cascade always pays for the ANN (the linear model is too weak to
+    flag its own errors), so it is never faster than "ann" alone: it trades
+    the linear call, the thread hand-off and the escalated forest rows for
+    accuracy. `report` prints that trade-off against "ann".
+
+    The predictor holds no per-call state, so one instance can be shared
+    across sessions (e.g. via st.cache_resource).
+    """
+
+    def __init__(self, ann, linear, forest, policy="cascade", threshold=1.5, escalate_to="ensemble"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES}")
+        if escalate_to not in ("forest", "ensemble"):
+            raise ValueError("escalate_to must be 'forest' or 'ensemble'")
+        self.ann = ann
+        self.linear = linear
+        self.forest = forest
+        # Parallelism comes from running members side by side; per-tree
+        # threading only adds overhead for the 1-row form submissions.
+        self.forest.n_jobs = 1
+        self.policy = policy
+        self.threshold = threshold
+        self.escalate_to = escalate_to
+        self._pool = ThreadPoolExecutor(max_workers=3)
+
+    def _member(self, name, x_p):
+        if name == "ann":
+            # Direct call avoids model.predict()'s per-call dataset setup,
+            # which dominates latency for single rows.
+            return np.asarray(self.ann(x_p, training=False)).reshape(-1)
+        model = self.linear if name == "linear" else self.forest
+        return np.asarray(model.predict(x_p), dtype=np.float32).reshape(-1)
+
+    def _parallel(self, names, x_p):
+        futures = {name: self._pool.submit(self._member, name, x_p) for name in names}
+        return {name: f.result() for name, f in futures.items()}
+
+    def predict_members(self, x_p):
+        """Per-member predictions on one shared preprocessed matrix."""
+        return self._parallel(("linear", "forest", "ann"), to_dense(x_p).astype(np.float32))
+
+    def predict_with_routing(self, x_p):
+        """Predictions of shape (n, 1) plus a boolean mask of escalated rows."""
+        x_p = to_dense(x_p).astype(np.float32)
+        escalate = np.zeros(x_p.shape[0], dtype=bool)
+
+        if self.policy in ("linear", "forest", "ann"):
+            pred = self._member(self.policy, x_p)
+        elif self.policy == "ensemble":
+            preds = self._parallel(("linear", "forest", "ann"), x_p)
+            pred = np.mean(list(preds.values()), axis=0)
+        else:
+            cheap = self._parallel(("linear", "ann"), x_p)
+            pred = (cheap["linear"] + cheap["ann"]) / 2.0
+            escalate = np.abs(cheap["linear"] - cheap["ann"]) > self.threshold
+            if escalate.any():
+                forest_pred = self._member("forest", x_p[escalate])
+                if self.escalate_to == "forest":
+                    pred[escalate] = forest_pred
+                else:
+                    pred[escalate] = (cheap["linear"][escalate] + cheap["ann"][escalate] + forest_pred) / 3.0
+
+        return pred.reshape(-1, 1), escalate
+
+    def predict(self, x_p, verbose=0):
+        return self.predict_with_routing(x_p)[0]
+
+
+def load_ensemble_artifacts(policy="cascade", threshold=1.5, escalate_to="ensemble"):
+    """Same (model, preprocessor, feature_cols) tuple as app.py's `load_artifacts`."""
+    ann = keras.models.load_model(MODEL_PATH)
+    members = joblib.load(MEMBERS_PATH)
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    with open(FEATURE_COLS_PATH, "r") as f:
+        feature_cols = json.load(f)
+    model = EnsemblePredictor(
+        ann, members["linear"], members["forest"],
+        policy=policy, threshold=threshold, escalate_to=escalate_to,
+    )
+    return model, preprocessor, feature_cols
+
+
+# -----------------------------------------------------------------------------
+# 2. FIT + REPORT
+# -----------------------------------------------------------------------------
+def fit_members():
+    """Train the sklearn members exactly like the notebook, minus the refit."""
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    X_train, _, y_train, _ = load_base_split()
+    X_train_p = to_dense(preprocessor.transform(X_train))
+
+    linear = LinearRegression().fit(X_train_p, y_train)
+    forest = RandomForestRegressor(n_estimators=400, random_state=SEED, n_jobs=-1).fit(X_train_p, y_train)
+
+    joblib.dump({"linear": linear, "forest": forest}, MEMBERS_PATH)
+    print(f"Saved: {MEMBERS_PATH}")
+
+
+def report(threshold, escalate_to, repeats):
+    model, preprocessor, _ = load_ensemble_artifacts(threshold=threshold, escalate_to=escalate_to)
+    _, X_test, _, y_test = load_base_split()
+    X_test_p = to_dense(preprocessor.transform(X_test)).astype(np.float32)
+    y_true = np.asarray(y_test)
+
+    print(f"Hold-out rows: {len(y_true)}, cascade threshold: {threshold}, escalate to: {escalate_to}")
+    print(f"{'policy':>9}  {'MAE':>7}  {'RMSE':>7}  {'p50 ms':>7}  {'p95 ms':>7}  {'batch ms':>8}  {'escalated':>9}")
+
+    results = {}
+    for policy in POLICIES:
+        model.policy = policy
+        model.predict(X_test_p[:1])  # warm-up
+
+        t0 = time.perf_counter()
+        pred, escalated = model.predict_with_routing(X_test_p)
+        batch_ms = (time.perf_counter() - t0) * 1000
+        pred = pred.flatten()
+
+        # Single-row latency is what a form submission sees.
+        times = []
+        for _ in range(repeats):
+            for i in range(len(X_test_p)):
+                t0 = time.perf_counter()
+                model.predict(X_test_p[i:i + 1])
+                times.append((time.perf_counter() - t0) * 1000)
+
+        mae = float(np.mean(np.abs(y_true - pred)))
+        rmse = float(np.sqrt(np.mean((y_true - pred) ** 2)))
+        p50, p95 = np.percentile(times, [50, 95])
+        esc = f"{escalated.mean():.0%}" if policy == "cascade" else "-"
+        print(f"{policy:>9}  {mae:>7.4f}  {rmse:>7.4f}  {p50:>7.2f}  {p95:>7.2f}  {batch_ms:>8.1f}  {esc:>9}")
+        results[policy] = (mae, p50, p95)
+
+    (ann_mae, ann_p50, ann_p95), (mae, p50, p95) = results["ann"], results["cascade"]
+    print(f"\ncascade vs ann: MAE {mae - ann_mae:+.4f}, "
+          f"p50 {p50 / ann_p50:.2f}x, p95 {p95 / ann_p95:.2f}x the latency")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensemble of LinearRegression, RandomForest and the ANN.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("fit", help="train and save the sklearn ensemble members")
+    p_report = sub.add_parser("report", help="accuracy and latency for each routing policy")
+    p_report.add_argument("--threshold", type=float, default=1.5, help="cascade disagreement threshold (grade points)")
+    p_report.add_argument("--escalate-to", choices=["forest", "ensemble"], default="ensemble")
+    p_report.add_argument("--repeats", type=int, default=1, help="passes over the hold-out set for latency")
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        fit_members()
+    else:
+        report(args.threshold, args.escalate_to, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Offline load-test harness with a synthetic student traffic generator.
+
+Profiles are bootstrapped from the joint distribution in `student-mat.csv` /
+`student-por.csv` (whole rows, so feature correlations are preserved). Traffic
+is repeat-heavy like the real form: a share of requests come from returning
+sessions that resubmit their last profile with one form field tweaked.
+
+Requests are sent OPEN-LOOP: arrivals follow a Poisson schedule at the offered
+rate regardless of how fast responses come back, and latency is measured from
+the scheduled send time, so queueing under overload shows up in the numbers.
+A rate counts as saturated when requests queue (p99 wait before a worker
+picks them up), p99 latency breaks the SLO, or errors appear. Throughput only
+counts completions inside the measurement window.
+
+Targets (all local, no network access needed):
+    keras                   preprocessor.joblib + model.predict, as in app.py
+    shared                  serve_prefork.SharedPredictor (NumPy only)
+    http://host:port/path   e.g. a running `serve_prefork.py serve`
+
+Usage:
+    python loadtest.py --target keras --rates 5 10 20 50 --duration 10 --concurrency 4
+"""
+import argparse
+import json
+import threading
+from collections import Counter
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from student_data import FEATURE_COLS_PATH, MODEL_PATH, PREPROCESSOR_PATH, load_student_rows
+
+# Fields a returning user can change on the form in app.py, with their ranges
+FORM_FIELDS = {
+    "sex": ["F", "M"],
+    "age": list(range(15, 23)),
+    "subject": ["math", "portuguese"],
+    "studytime": [1, 2, 3, 4],
+    "failures": [0, 1, 2, 3, 4],
+    "absences": list(range(0, 31)),
+    "schoolsup": ["yes", "no"],
+    "internet": ["yes", "no"],
+    "romantic": ["yes", "no"],
+    "famsup": ["yes", "no"],
+}
+
+
+# -----------------------------------------------------------------------------
+# 1. TRAFFIC GENERATOR
+# -----------------------------------------------------------------------------
+class TrafficGenerator:
+    """
+    Yields student profiles for successive requests.
+
+    With probability `repeat`, a request comes from one of the `sessions`
+    most recent users, who resubmits their previous profile and, with
+    probability `tweak`, first changes one form field. Otherwise a new user
+    arrives with a profile bootstrapped from the dataset.
+    """
+
+    def __init__(self, profiles, repeat=0.6, tweak=0.5, sessions=50, seed=42):
+        self.profiles = profiles
+        self.repeat = repeat
+        self.tweak = tweak
+        self.sessions = sessions
+        self.rng = np.random.default_rng(seed)
+        self.recent = []
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            if self.recent and self.rng.random() < self.repeat:
+                i = int(self.rng.integers(len(self.recent)))
+                profile = dict(self.recent[i])
+                if self.rng.random() < self.tweak:
+                    field = list(FORM_FIELDS)[int(self.rng.integers(len(FORM_FIELDS)))]
+                    choices = FORM_FIELDS[field]
+                    profile[field] = choices[int(self.rng.integers(len(choices)))]
+                self.recent[i] = profile
+            else:
+                profile = dict(self.profiles[int(self.rng.integers(len(self.profiles)))])
+                self.recent.append(profile)
+                if len(self.recent) > self.sessions:
+                    self.recent.pop(0)
+            return profile
+
+
+# -----------------------------------------------------------------------------
+# 2. TARGETS
+# -----------------------------------------------------------------------------
+def keras_target():
+    """The prediction path app.py runs on submit."""
+    import joblib
+    import pandas as pd
+    from tensorflow import keras
+
+    model = keras.models.load_model(MODEL_PATH)
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    with open(FEATURE_COLS_PATH, "r") as f:
+        feature_cols = json.load(f)
+
+    def predict(profile):
+        x = pd.DataFrame([profile], columns=feature_cols)
+        x_p = preprocessor.transform(x)
+        x_p = x_p.toarray() if hasattr(x_p, "toarray") else x_p
+        return float(model.predict(x_p, verbose=0).flatten()[0])
+
+    return predict
+
+
+def shared_target():
+    from serve_prefork import SharedPredictor, WEIGHTS_PATH, ensure_compiled
+
+    ensure_compiled()
+    predictor = SharedPredictor(WEIGHTS_PATH)
+    return lambda profile: float(predictor.predict([profile])[0])
+
+
+def http_target(url, timeout):
+    def predict(profile):
+        req = urllib.request.Request(
+            url, data=json.dumps(profile).encode(), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())["grade"]
+
+    return predict
+
+
+def make_target(target, timeout):
+    if target == "keras":
+        return keras_target()
+    if target == "shared":
+        return shared_target()
+    if target.startswith("http://") or target.startswith("https://"):
+        return http_target(target, timeout)
+    raise ValueError(f"Unknown target '{target}'")
+
+
+# -----------------------------------------------------------------------------
+# 3. OPEN-LOOP RUNNER
+# -----------------------------------------------------------------------------
+def poisson_offsets(rate, duration, rng):
+    """Arrival times in [0, duration) of a Poisson process with `rate` req/s."""
+    if rate <= 0:
+        raise ValueError(f"rate must be > 0, got {rate}")
+    chunks, total = [], 0.0
+    # Keep drawing gaps until the schedule covers the whole window; a fixed
+    # rate * duration draw would end early about half the time.
+    while total < duration:
+        gaps = rng.exponential(1.0 / rate, size=max(16, int(rate * duration * 0.1)))
+        arrivals = total + np.cumsum(gaps)
+        chunks.append(arrivals)
+        total = float(arrivals[-1])
+    offsets = np.concatenate(chunks)
+    return offsets[offsets < duration]
+
+
+def run_rate(predict, generator, rate, duration, concurrency, seed):
+    """
+    Offer `rate` req/s for `duration` seconds.
+
+    Returns (per-request records, start time, number of requests sent). Each
+    record is (latency, queue wait, completion time, error), where error is
+    None or an (exception type, message) pair.
+    """
+    offsets = poisson_offsets(rate, duration, np.random.default_rng(seed))
+    records = []
+    records_lock = threading.Lock()
+
+    def call(scheduled, profile):
+        began = time.perf_counter()
+        error = None
+        try:
+            predict(profile)
+        except Exception as e:
+            error = (type(e).__name__, str(e))
+        done = time.perf_counter()
+        with records_lock:
+            records.append((done - scheduled, began - scheduled, done, error))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset in offsets:
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Never wait for a free worker: excess requests queue in the pool
+            # and that wait is charged to their latency.
+            pool.submit(call, scheduled, generator.next())
+    return records, start, len(offsets)
+
+
+def summarize(rate, duration, records, start, sent):
+    latencies = np.array([r[0] for r in records]) * 1000
+    waits = np.array([r[1] for r in records]) * 1000
+    errors = Counter(r[3][0] for r in records if r[3] is not None)
+    examples = {}
+    for r in records:
+        if r[3] is not None:
+            examples.setdefault(r[3][0], r[3][1])
+    # Completions after the window are the backlog draining, not throughput.
+    in_window = sum(1 for r in records if r[2] - start <= duration)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        "offered_rps": rate,
+        "sent_rps": sent / duration,
+        "achieved_rps": in_window / duration,
+        "requests": len(records),
+        "error_rate": sum(errors.values()) / len(records) if records else 0.0,
+        "errors": dict(errors),
+        "error_examples": examples,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()) if len(latencies) else float("nan"),
+        "p99_wait_ms": float(np.percentile(waits, 99)) if len(waits) else float("nan"),
+    }
+
+
+def is_saturated(result, slo_ms, max_wait_ms, max_error_rate):
+    # Queueing, not a throughput ratio: a short window can end with requests
+    # still in flight on an idle target, but they will not have waited.
+    return (
+        result["p99_wait_ms"] > max_wait_ms
+        or result["p99_ms"] > slo_ms
+        or result["error_rate"] > max_error_rate
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test with synthetic student traffic.")
+    parser.add_argument("--target", default="keras", help="keras | shared | http://host:port/predict")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 50, 100], help="offered req/s to sweep")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--concurrency", type=int, default=4, help="max in-flight requests")
+    parser.add_argument("--repeat", type=float, default=0.6, help="share of requests from returning sessions")
+    parser.add_argument("--tweak", type=float, default=0.5, help="chance a returning session changes one form field")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency above which a rate counts as saturated")
+    parser.add_argument("--max-wait-ms", type=float, default=50.0,
+                        help="p99 queue wait (scheduled send -> picked up) above which a rate counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=10.0, help="HTTP timeout (seconds)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write per-rate results to this file")
+    args = parser.parse_args()
+    if any(rate <= 0 for rate in args.rates):
+        parser.error("--rates must all be > 0")
+    if args.duration <= 0:
+        parser.error("--duration must be > 0")
+
+    predict = make_target(args.target, args.timeout)
+    generator = TrafficGenerator(load_student_rows(), repeat=args.repeat, tweak=args.tweak, seed=args.seed)
+    predict(generator.next())  # warm-up outside the measurement
+
+    print(f"Target: {args.target}  concurrency: {args.concurrency}  {args.duration:.0f}s per rate")
+    print(f"{'offered':>8}  {'sent':>8}  {'achieved':>8}  {'err %':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}"
+          f"  {'max ms':>8}  {'p99 wait':>8}")
+
+    results, saturation = [], None
+    for i, rate in enumerate(sorted(args.rates)):
+        records, start, sent = run_rate(predict, generator, rate, args.duration, args.concurrency, args.seed + i)
+        result = summarize(rate, args.duration, records, start, sent)
+        results.append(result)
+        print(f"{result['offered_rps']:>8.1f}  {result['sent_rps']:>8.1f}  {result['achieved_rps']:>8.1f}  {result['error_rate'] * 100:>6.2f}"
+              f"  {result['p50_ms']:>8.1f}  {result['p95_ms']:>8.1f}  {result['p99_ms']:>8.1f}  {result['max_ms']:>8.1f}"
+              f"  {result['p99_wait_ms']:>8.1f}")
+        if saturation is None and is_saturated(result, args.slo_ms, args.max_wait_ms, args.max_error_rate):
+            saturation = rate
+
+    errors = Counter()
+    examples = {}
+    for result in results:
+        errors.update(result["errors"])
+        for name, message in result["error_examples"].items():
+            examples.setdefault(name, message)
+    if errors:
+        print("\nErrors by type:")
+        for name, count in errors.most_common():
+            print(f"  {count:>6}  {name}: {examples[name]}")
+
+    if saturation is None:
+        print(f"\nNo saturation up to {max(args.rates):.1f} req/s")
+    else:
+        print(f"\nSaturation point: ~{saturation:.1f} req/s (p99 wait > {args.max_wait_ms:.0f} ms, "
+              f"p99 > {args.slo_ms:.0f} ms, or errors > {args.max_error_rate:.0%})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"target": args.target, "concurrency": args.concurrency,
+                       "saturation_rps": saturation, "results": results}, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Incremental (warm-start) retraining for the Backbencher's Oracle ANN.
+
+Instead of refitting the ColumnTransformer and training from random init for
+up to 800 epochs (see main.ipynb), this script:
+
+1. loads the current `student_grade_ann_best.keras` and `preprocessor.joblib`
+2. streams only the newly labelled rows plus a replay sample of the old data
+3. fine-tunes for a bounded epoch / wall-clock budget at a low learning rate
+4. promotes the result only if it holds up on the notebook's fixed hold-out set
+
+Usage:
+    python retrain_incremental.py new_students.csv [more.csv ...] --subject math
+"""
+import argparse
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.model_selection import train_test_split
+from tensorflow import keras
+
+from student_data import MODEL_PATH, PREPROCESSOR_PATH, SEED, TARGET, load_base_split, to_dense
+
+# Early stopping holds out 10% of the fine-tuning mix, so it needs at least
+# one validation row and a few rows to fit on.
+MIN_MIX_ROWS = 10
+
+
+# -----------------------------------------------------------------------------
+# 1. DATA
+# -----------------------------------------------------------------------------
+def load_new_rows(paths, subject, feature_cols):
+    """Read newly labelled students (UCI ';'-separated layout, G3 required)."""
+    frames = []
+    for path in paths:
+        part = pd.read_csv(path, sep=";")
+        if "subject" not in part.columns:
+            if subject is None:
+                raise ValueError(f"{path} has no 'subject' column; pass --subject")
+            part["subject"] = subject
+        frames.append(part)
+    new = pd.concat(frames, ignore_index=True)
+
+    if TARGET not in new.columns:
+        raise ValueError(f"New data must contain the '{TARGET}' label")
+    missing = [c for c in feature_cols if c not in new.columns]
+    if missing:
+        raise ValueError(f"New data is missing feature column(s): {', '.join(missing)}")
+    new = new.dropna(subset=[TARGET])
+
+    return new[feature_cols], new[TARGET].astype(np.float32)
+
+
+def make_stream(X_p, y, batch_size):
+    """Shuffled, batched tf.data stream over the fine-tuning rows."""
+    ds = tf.data.Dataset.from_tensor_slices(
+        (X_p.astype(np.float32), np.asarray(y, dtype=np.float32))
+    )
+    return ds.shuffle(len(y), seed=SEED).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+# -----------------------------------------------------------------------------
+# 2. TRAINING
+# -----------------------------------------------------------------------------
+class TimeBudget(keras.callbacks.Callback):
+    """Stop training once the wall-clock budget (seconds) is spent."""
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+        self.start = None
+
+    def on_train_begin(self, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.perf_counter() - self.start >= self.seconds:
+            self.model.stop_training = True
+
+
+def warm_start_model(path, learning_rate, freeze_bn=True):
+    """Load the deployed ANN and recompile it for low-LR fine-tuning."""
+    model = keras.models.load_model(path)
+    if freeze_bn:
+        # Keep the running statistics learned on the full dataset; a few
+        # hundred new rows should not redefine the input distribution.
+        for layer in model.layers:
+            if isinstance(layer, keras.layers.BatchNormalization):
+                layer.trainable = False
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss="mse",
+        metrics=["mae", keras.metrics.RootMeanSquaredError()],
+    )
+    return model
+
+
+def holdout_mae(model, X_p, y):
+    pred = model.predict(X_p, verbose=0).flatten()
+    return float(np.mean(np.abs(np.asarray(y) - pred)))
+
+
+def full_retrain(path, X_p, y, X_test_p, y_test):
+    """
+    Reference run of the notebook's final recipe: same architecture from
+    random init, up to 800 epochs with ReduceLROnPlateau + EarlyStopping.
+    Returns (seconds, hold-out MAE); the result is never promoted.
+    """
+    model = keras.models.clone_model(keras.models.load_model(path))  # fresh weights
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=1e-3),
+        loss="mse",
+        metrics=["mae", keras.metrics.RootMeanSquaredError()],
+    )
+    callbacks = [
+        keras.callbacks.ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=8, min_lr=1e-5),
+        keras.callbacks.EarlyStopping(monitor="val_loss", patience=40, restore_best_weights=True),
+    ]
+    t0 = time.perf_counter()
+    model.fit(X_p, np.asarray(y), validation_split=0.2, epochs=800, batch_size=32, callbacks=callbacks, verbose=0)
+    return time.perf_counter() - t0, holdout_mae(model, X_test_p, y_test)
+
+
+# -----------------------------------------------------------------------------
+# 3. MAIN
+# -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Warm-start retrain on newly labelled students.")
+    parser.add_argument("new_data", nargs="+", help="CSV file(s) with newly labelled students")
+    parser.add_argument("--subject", choices=["math", "portuguese"], help="subject for CSVs without a 'subject' column")
+    parser.add_argument("--replay-ratio", type=float, default=1.0, help="old rows replayed per new row (default: 1.0)")
+    parser.add_argument("--epochs", type=int, default=30, help="max fine-tuning epochs (default: 30)")
+    parser.add_argument("--time-budget", type=float, default=60.0, help="max fine-tuning seconds (default: 60)")
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="allowed relative hold-out MAE regression before rejecting (default: 0.0)")
+    parser.add_argument("--no-freeze-bn", action="store_true", help="also update BatchNormalization statistics")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--compare-full", action="store_true",
+                        help="also time a from-scratch retrain on old + new data for reference (slow)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    tf.random.set_seed(SEED)
+    rng = np.random.default_rng(SEED)
+
+    # The preprocessor is reused as-is: no refit, so the deployed schema and
+    # scaling stay identical to what app.py serves.
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    X_train, X_test, y_train, y_test = load_base_split()
+    feature_cols = X_train.columns.tolist()
+
+    X_new, y_new = load_new_rows(args.new_data, args.subject, feature_cols)
+    if len(X_new) == 0:
+        print("No labelled rows found in new data; nothing to do.")
+        return
+
+    n_replay = min(len(X_train), int(round(len(X_new) * args.replay_ratio)))
+    if len(X_new) + n_replay < MIN_MIX_ROWS:
+        raise SystemExit(
+            f"Fine-tuning mix has only {len(X_new) + n_replay} row(s) "
+            f"({len(X_new)} new + {n_replay} replayed); need at least {MIN_MIX_ROWS}. "
+            "Add more labelled rows or raise --replay-ratio."
+        )
+    replay_idx = rng.choice(len(X_train), size=n_replay, replace=False)
+    X_mix = pd.concat([X_new, X_train.iloc[replay_idx]], ignore_index=True)
+    y_mix = pd.concat([y_new, y_train.iloc[replay_idx]], ignore_index=True)
+
+    X_mix_p = to_dense(preprocessor.transform(X_mix))
+    X_test_p = to_dense(preprocessor.transform(X_test))
+
+    # Early stopping watches a slice of the fine-tuning mix; the fixed
+    # hold-out set is reserved for the promotion decision.
+    X_fit, X_val, y_fit, y_val = train_test_split(X_mix_p, y_mix, test_size=0.1, random_state=SEED)
+
+    baseline = keras.models.load_model(args.model)
+    baseline_mae = holdout_mae(baseline, X_test_p, y_test)
+    del baseline
+
+    model = warm_start_model(args.model, args.learning_rate, freeze_bn=not args.no_freeze_bn)
+    early_stop = keras.callbacks.EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)
+
+    t_fit = time.perf_counter()
+    history = model.fit(
+        make_stream(X_fit, y_fit, args.batch_size),
+        validation_data=make_stream(X_val, y_val, args.batch_size),
+        epochs=args.epochs,
+        callbacks=[early_stop, TimeBudget(args.time_budget)],
+        verbose=0,
+    )
+    fit_seconds = time.perf_counter() - t_fit
+
+    candidate_mae = holdout_mae(model, X_test_p, y_test)
+    promote = candidate_mae <= baseline_mae * (1.0 + args.tolerance)
+
+    print(f"New rows:         {len(X_new)}")
+    print(f"Replayed rows:    {n_replay}")
+    print(f"Epochs run:       {len(history.history['loss'])} / {args.epochs}")
+    print(f"Fine-tune time:   {fit_seconds:.1f}s")
+    print(f"Hold-out MAE:     {baseline_mae:.4f} -> {candidate_mae:.4f}")
+
+    if promote:
+        # Write next to the target and swap atomically so app.py never
+        # loads a half-written file; keep the previous model as a backup.
+        tmp_path = args.model + ".candidate.keras"
+        model.save(tmp_path)
+        shutil.copy2(args.model, args.model + ".bak")
+        os.replace(tmp_path, args.model)
+        print(f"✅ Promoted candidate to {args.model} (previous saved as {args.model}.bak)")
+    else:
+        print("❌ Candidate regressed on the hold-out set; keeping the current model.")
+
+    if args.compare_full:
+        X_all = pd.concat([X_train, X_new], ignore_index=True)
+        y_all = pd.concat([y_train, y_new], ignore_index=True)
+        full_seconds, full_mae = full_retrain(
+            args.model, to_dense(preprocessor.transform(X_all)), y_all, X_test_p, y_test
+        )
+        print(f"Full retrain:     {full_seconds:.1f}s, hold-out MAE {full_mae:.4f} (reference only)")
+        print(f"Fine-tune / full: {fit_seconds / full_seconds:.1%} of the wall-clock")
+
+    print(f"Total wall-clock: {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
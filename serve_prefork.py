@@ -0,0 +1,520 @@
+"""
+Pre-fork HTTP serving with shared, read-only model weights.
+
+Running several Streamlit/HTTP workers normally means every process imports
+TensorFlow and loads `student_grade_ann_best.keras` + `preprocessor.joblib`
+on its own. Here the artifacts are compiled ONCE into a flat, mmap-able file:
+
+- the ANN is flattened into plain Dense layers (BatchNorm folded in,
+  Dropout removed, since both are fixed at inference time)
+- the ColumnTransformer is reduced to its lookup tables (scaler mean/scale,
+  one-hot categories); missing fields get app.py's form defaults (0 / "no")
+
+The parent maps that file read-only and forks the workers, which share the
+same physical pages and run inference with NumPy only (no TensorFlow import).
+
+Usage:
+    python serve_prefork.py compile                 # (re)build inference_weights.bin
+    python serve_prefork.py serve --workers 4       # POST /predict on :8000
+    python serve_prefork.py bench --duration 5      # HTTP req/s + worker RSS/PSS, 1..cores workers
+"""
+import os
+import sys
+
+# One BLAS thread per worker: parallelism comes from processes, not threads.
+# BLAS reads these when NumPy is first imported, so they have to be set before
+# the import below. Only the `serve` / `bench` entry points do this; importing
+# the module (e.g. from loadtest.py) leaves the environment untouched.
+_BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+_BLAS_VARS_SET = []
+if __name__ == "__main__" and sys.argv[1:2] in (["serve"], ["bench"]):
+    for _var in _BLAS_THREAD_VARS:
+        if _var not in os.environ:
+            os.environ[_var] = "1"
+            _BLAS_VARS_SET.append(_var)
+
+import argparse
+import json
+import math
+import signal
+import socket
+import struct
+import subprocess
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+from student_data import (
+    APP_FORM_FIELDS, DEFAULT_CAT, DEFAULT_NUM, FEATURE_COLS_PATH, MODEL_PATH, PREPROCESSOR_PATH,
+    load_student_rows,
+)
+
+WEIGHTS_PATH = "inference_weights.bin"
+ALIGN = 64
+
+
+# -----------------------------------------------------------------------------
+# 1. COMPILE (runs once, in a separate process, imports TensorFlow)
+# -----------------------------------------------------------------------------
+def _final_step(step):
+    """Last estimator of a sklearn Pipeline (or the step itself).
+
+    Imputers are skipped on purpose: missing fields are filled with app.py's
+    build_input_row defaults before encoding, so they never see a NaN.
+    """
+    return step.steps[-1][1] if hasattr(step, "steps") else step
+
+
+def compile_preprocessor(preprocessor):
+    """Reduce the fitted ColumnTransformer to plain numeric/categorical tables."""
+    arrays, numeric, categorical = {}, [], []
+
+    for name, step, cols in preprocessor.transformers_:
+        if step == "drop" or name == "remainder":
+            continue
+        final = _final_step(step)
+        cols = list(cols)
+
+        if hasattr(final, "categories_"):
+            if getattr(final, "drop_idx_", None) is not None:
+                raise ValueError("OneHotEncoder(drop=...) is not supported")
+            for col, cats in zip(cols, final.categories_):
+                categorical.append({"col": col, "categories": [str(c) for c in cats]})
+        elif hasattr(final, "mean_") or hasattr(final, "scale_"):
+            n = len(cols)
+            mean = final.mean_ if getattr(final, "mean_", None) is not None else np.zeros(n)
+            scale = final.scale_ if getattr(final, "scale_", None) is not None else np.ones(n)
+            arrays["num_mean"] = np.asarray(mean, dtype=np.float32)
+            arrays["num_scale"] = np.asarray(scale, dtype=np.float32)
+            numeric.extend(cols)
+        else:
+            raise TypeError(f"Unsupported transformer step: {type(final).__name__}")
+
+    return arrays, {"numeric": numeric, "categorical": categorical}
+
+
+def compile_model(model):
+    """Flatten the Sequential ANN into (W, b, activation) triples."""
+    from tensorflow import keras
+
+    layers, pending = [], None
+
+    def flush():
+        if pending is not None:
+            layers.append(tuple(pending))
+
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.Dense):
+            flush()
+            weights = layer.get_weights()
+            W = weights[0].astype(np.float64)
+            b = weights[1].astype(np.float64) if layer.use_bias else np.zeros(W.shape[1])
+            pending = [W, b, layer.activation.__name__]
+        elif isinstance(layer, keras.layers.BatchNormalization):
+            if pending is None or pending[2] != "linear":
+                raise ValueError("BatchNormalization must directly follow a linear Dense layer")
+            weights = list(layer.get_weights())
+            gamma = weights.pop(0) if layer.scale else 1.0
+            beta = weights.pop(0) if layer.center else 0.0
+            moving_mean, moving_var = weights
+            k = gamma / np.sqrt(moving_var + layer.epsilon)
+            pending[0] = pending[0] * k
+            pending[1] = (pending[1] - moving_mean) * k + beta
+        elif isinstance(layer, keras.layers.Activation):
+            if pending is None or pending[2] != "linear":
+                raise ValueError("Activation must follow a linear Dense layer")
+            pending[2] = layer.activation.__name__
+        elif isinstance(layer, (keras.layers.Dropout, keras.layers.InputLayer)):
+            continue
+        else:
+            raise TypeError(f"Unsupported layer: {type(layer).__name__}")
+    flush()
+
+    arrays, meta = {}, []
+    for i, (W, b, act) in enumerate(layers):
+        if act not in ("relu", "linear"):
+            raise ValueError(f"Unsupported activation: {act}")
+        arrays[f"W{i}"] = W.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+        meta.append(act)
+    return arrays, meta
+
+
+def write_blob(path, arrays, header):
+    """[u64 header length][JSON header][pad][64-byte aligned float32 arrays]."""
+    offset, index = 0, {}
+    for name, arr in arrays.items():
+        index[name] = {"offset": offset, "shape": list(arr.shape)}
+        offset += int(math.ceil(arr.nbytes / ALIGN) * ALIGN)
+    header = dict(header, arrays=index)
+
+    raw = json.dumps(header).encode()
+    data_start = int(math.ceil((8 + len(raw)) / ALIGN) * ALIGN)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        f.write(b"\0" * (data_start - 8 - len(raw)))
+        for name, arr in arrays.items():
+            buf = np.ascontiguousarray(arr, dtype=np.float32).tobytes()
+            f.write(buf)
+            f.write(b"\0" * (int(math.ceil(len(buf) / ALIGN) * ALIGN) - len(buf)))
+    os.replace(tmp, path)
+
+
+def compile_artifacts(out_path=WEIGHTS_PATH):
+    import joblib
+    from tensorflow import keras
+
+    model = keras.models.load_model(MODEL_PATH)
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    with open(FEATURE_COLS_PATH, "r") as f:
+        feature_cols = json.load(f)
+
+    pre_arrays, pre_meta = compile_preprocessor(preprocessor)
+    net_arrays, activations = compile_model(model)
+
+    header = {"feature_cols": feature_cols, "activations": activations, **pre_meta}
+    write_blob(out_path, {**pre_arrays, **net_arrays}, header)
+
+    # Sanity check: the compiled path must match Keras on real rows.
+    rows = load_student_rows(limit=64)
+    x = preprocessor.transform(_rows_to_frame(rows, feature_cols, pre_meta["numeric"]))
+    x = x.toarray() if hasattr(x, "toarray") else x
+    expected = model.predict(x, verbose=0).flatten()
+    got = SharedPredictor(out_path).predict(rows)
+    err = float(np.max(np.abs(expected - got)))
+
+    # ...and on form-only rows, filled the way app.py's build_input_row does.
+    form_rows = [{k: row[k] for k in APP_FORM_FIELDS if k in row} for row in rows]
+    filled = [
+        {col: row.get(col, DEFAULT_NUM if col in pre_meta["numeric"] else DEFAULT_CAT) for col in feature_cols}
+        for row in form_rows
+    ]
+    x = preprocessor.transform(_rows_to_frame(filled, feature_cols, pre_meta["numeric"]))
+    x = x.toarray() if hasattr(x, "toarray") else x
+    expected = model.predict(x, verbose=0).flatten()
+    got = SharedPredictor(out_path).predict(form_rows)
+    err = max(err, float(np.max(np.abs(expected - got))))
+
+    if err > 1e-3:
+        raise RuntimeError(f"Compiled model disagrees with Keras (max abs error {err:.5f})")
+    print(f"Saved: {out_path} ({os.path.getsize(out_path) / 1024:.1f} KiB, max abs error vs Keras {err:.2e})")
+
+
+def _rows_to_frame(rows, feature_cols, numeric_cols):
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=feature_cols)
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def ensure_compiled(path=WEIGHTS_PATH):
+    """Rebuild the blob in a child process if missing or older than the artifacts."""
+    sources = [MODEL_PATH, PREPROCESSOR_PATH, FEATURE_COLS_PATH]
+    if os.path.exists(path) and all(os.path.getmtime(path) >= os.path.getmtime(s) for s in sources):
+        return
+    # Compile out-of-process so the serving parent never imports TensorFlow
+    # (and never forks with TensorFlow's thread pools alive).
+    # The compile step uses TensorFlow's own threading, so it does not inherit
+    # the single-thread BLAS settings made for the serving workers.
+    env = {k: v for k, v in os.environ.items() if k not in _BLAS_VARS_SET}
+    subprocess.run([sys.executable, os.path.abspath(__file__), "compile", "--out", path], check=True, env=env)
+
+
+# -----------------------------------------------------------------------------
+# 2. SHARED READ-ONLY INFERENCE (NumPy only)
+# -----------------------------------------------------------------------------
+class SharedPredictor:
+    """Read-only view over the compiled weights file; safe to share across fork()."""
+
+    def __init__(self, path=WEIGHTS_PATH):
+        with open(path, "rb") as f:
+            (n,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(n))
+        data_start = int(math.ceil((8 + n) / ALIGN) * ALIGN)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start)
+
+        def view(name):
+            spec = header["arrays"][name]
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            start = spec["offset"]
+            return self._mm[start:start + count * 4].view(np.float32).reshape(spec["shape"])
+
+        self.feature_cols = header["feature_cols"]
+        self.numeric = header["numeric"]
+        self.categorical = header["categorical"]
+        self.num_mean = view("num_mean") if self.numeric else None
+        self.num_scale = view("num_scale") if self.numeric else None
+        self.layers = [(view(f"W{i}"), view(f"b{i}"), act) for i, act in enumerate(header["activations"])]
+
+        self._cat_index = []
+        offset = len(self.numeric)
+        for spec in self.categorical:
+            self._cat_index.append({c: offset + j for j, c in enumerate(spec["categories"])})
+            offset += len(spec["categories"])
+        self.n_inputs = offset
+
+    def transform(self, rows):
+        """
+        Rows (dicts keyed by feature name) -> dense model input, like the
+        ColumnTransformer. Missing fields get the same defaults as app.py's
+        build_input_row (0 / "no"), so a form-only request scores the same
+        as in the Streamlit app.
+        """
+        X = np.zeros((len(rows), self.n_inputs), dtype=np.float32)
+        if self.numeric:
+            num = np.full((len(rows), len(self.numeric)), DEFAULT_NUM, dtype=np.float32)
+            for i, row in enumerate(rows):
+                for j, col in enumerate(self.numeric):
+                    val = row.get(col)
+                    if val is not None and val != "":
+                        num[i, j] = float(val)
+            X[:, :len(self.numeric)] = (num - self.num_mean) / self.num_scale
+        for spec, index in zip(self.categorical, self._cat_index):
+            col = spec["col"]
+            for i, row in enumerate(rows):
+                val = row.get(col)
+                val = DEFAULT_CAT if val is None or val == "" else str(val)
+                j = index.get(val)
+                if j is not None:  # handle_unknown="ignore" -> all zeros
+                    X[i, j] = 1.0
+        return X
+
+    def predict(self, rows):
+        h = self.transform(rows)
+        for W, b, act in self.layers:
+            h = h @ W + b
+            if act == "relu":
+                np.maximum(h, 0.0, out=h)
+        return h[:, 0]
+
+
+# -----------------------------------------------------------------------------
+# 3. PRE-FORK HTTP SERVER
+# -----------------------------------------------------------------------------
+PREDICTOR = None  # set in the parent before fork, inherited by every worker
+
+
+class PredictHandler(BaseHTTPRequestHandler):
+    """POST /predict with a JSON object (one student) or list of objects."""
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"null")
+            rows = payload if isinstance(payload, list) else [payload]
+            if not rows or not all(isinstance(r, dict) for r in rows):
+                raise ValueError("expected a JSON object or a list of objects")
+            preds = [round(float(p), 4) for p in PREDICTOR.predict(rows)]
+        except (ValueError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+        body = {"grade": preds[0]} if isinstance(payload, dict) else {"grades": preds}
+        self._reply(200, body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._reply(200, {"status": "ok", "pid": os.getpid()})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _worker(sock):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = HTTPServer(sock.getsockname(), PredictHandler, bind_and_activate=False)
+    server.socket = sock  # every worker accept()s on the parent's listening socket
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def _listen(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def _fork_workers(sock, n):
+    pids = []
+    for _ in range(n):
+        pid = os.fork()
+        if pid == 0:
+            _worker(sock)
+        pids.append(pid)
+    return pids
+
+
+def _kill(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def serve(host, port, workers):
+    global PREDICTOR
+    ensure_compiled()
+    PREDICTOR = SharedPredictor(WEIGHTS_PATH)
+
+    sock = _listen(host, port)
+    children = _fork_workers(sock, workers)
+    print(f"🍌 Serving on http://{host}:{port}/predict with {workers} worker(s) (pids {children})")
+
+    def shutdown(signum, frame):
+        _kill(children)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+# -----------------------------------------------------------------------------
+# 4. BENCHMARK: serve() UNDER HTTP LOAD AS WORKERS SCALE
+# -----------------------------------------------------------------------------
+def _memory_kib(pid="self"):
+    """(RSS, PSS) of a process in KiB; PSS splits shared pages fairly."""
+    rss = pss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except FileNotFoundError:
+        pss = rss
+    return rss, pss
+
+
+def _bench_client(predict, generator, duration, write_fd):
+    """Closed-loop HTTP client: send the next profile as soon as the last one returns."""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            predict(generator.next())
+            latencies.append(time.perf_counter() - t0)
+        except Exception:
+            errors += 1
+    os.write(write_fd, json.dumps({"latencies": latencies, "errors": errors}).encode() + b"\n")
+    os._exit(0)
+
+
+def bench(duration, max_workers, clients, host="127.0.0.1"):
+    """
+    Run the real pre-fork server with 1..max_workers workers, drive it over
+    HTTP with `clients` client processes (loadtest.py's http target and
+    traffic generator), and read RSS/PSS of the serving workers themselves.
+    """
+    global PREDICTOR
+    from loadtest import TrafficGenerator, http_target
+
+    ensure_compiled()
+    PREDICTOR = SharedPredictor(WEIGHTS_PATH)
+    rows = load_student_rows()
+    PREDICTOR.predict(rows[:8])  # touch every weight page once in the parent
+
+    parent_rss, _ = _memory_kib()
+    print(f"Parent RSS after mapping weights: {parent_rss / 1024:.1f} MiB")
+    print(f"{clients} closed-loop HTTP client process(es), {duration:.0f}s per worker count")
+    print(f"{'workers':>7}  {'req/s':>8}  {'err':>5}  {'p50 ms':>7}  {'p99 ms':>7}  {'RSS/worker MiB':>14}  {'PSS/worker MiB':>14}")
+
+    for n in range(1, max_workers + 1):
+        sock = _listen(host, 0)
+        url = f"http://{host}:{sock.getsockname()[1]}/predict"
+        workers = _fork_workers(sock, n)
+        try:
+            # Pipe is created after the workers fork so they never hold its write end.
+            r, w = os.pipe()
+            client_pids = []
+            for i in range(clients):
+                pid = os.fork()
+                if pid == 0:
+                    os.close(r)
+                    sock.close()
+                    generator = TrafficGenerator(rows, seed=i)
+                    _bench_client(http_target(url, timeout=10.0), generator, duration, w)
+                client_pids.append(pid)
+            os.close(w)
+            with os.fdopen(r) as f:
+                results = [json.loads(line) for line in f if line.strip()]
+            for pid in client_pids:
+                os.waitpid(pid, 0)
+
+            # Workers are still alive and warm: this is their steady-state memory.
+            memory = [_memory_kib(pid) for pid in workers]
+        finally:
+            _kill(workers)
+            for pid in workers:
+                os.waitpid(pid, 0)
+            sock.close()
+
+        latencies = np.array([t for res in results for t in res["latencies"]]) * 1000
+        errors = sum(res["errors"] for res in results)
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (float("nan"),) * 2
+        rss = sum(m[0] for m in memory) / n / 1024
+        pss = sum(m[1] for m in memory) / n / 1024
+        print(f"{n:>7}  {len(latencies) / duration:>8.0f}  {errors:>5}  {p50:>7.2f}  {p99:>7.2f}  {rss:>14.1f}  {pss:>14.1f}")
+
+    print("(clients run on the same machine and compete with the workers for CPU)")
+
+
+# -----------------------------------------------------------------------------
+# 5. CLI
+# -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork serving with shared read-only weights.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_compile = sub.add_parser("compile", help="build the shared weights file from the saved artifacts")
+    p_compile.add_argument("--out", default=WEIGHTS_PATH)
+
+    p_serve = sub.add_parser("serve", help="run the pre-fork HTTP server")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8000)
+    p_serve.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    p_bench = sub.add_parser("bench", help="serve with 1..N workers under HTTP load; report throughput and memory")
+    p_bench.add_argument("--duration", type=float, default=5.0, help="seconds per worker count")
+    p_bench.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    p_bench.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="HTTP client processes")
+
+    args = parser.parse_args()
+    if args.command == "compile":
+        compile_artifacts(args.out)
+    elif args.command == "serve":
+        serve(args.host, args.port, args.workers)
+    else:
+        bench(args.duration, args.max_workers, args.clients)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared artifact paths and dataset loading for the helper scripts.
+
+Only the standard library is imported at module level so NumPy-only
+processes (serve_prefork.py workers, loadtest.py) can use it without pulling
+in pandas, scikit-learn or TensorFlow.
+"""
+import csv
+
+MODEL_PATH = "student_grade_ann_best.keras"
+PREPROCESSOR_PATH = "preprocessor.joblib"
+FEATURE_COLS_PATH = "feature_columns.json"
+DATASETS = (("student-mat.csv", "math"), ("student-por.csv", "portuguese"))
+
+TARGET = "G3"
+DROP_COLS = ["G1", "G2"]  # same realistic setting as the notebook
+SEED = 42
+
+# Values app.py's build_input_row fills in for fields the form does not send
+DEFAULT_NUM = 0
+DEFAULT_CAT = "no"
+
+# Fields the Streamlit form in app.py actually collects
+APP_FORM_FIELDS = (
+    "sex", "age", "subject", "studytime", "failures", "absences",
+    "schoolsup", "internet", "romantic", "famsup",
+)
+
+
+def _coerce(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_student_rows(limit=None):
+    """Students from the UCI CSVs as plain dicts (labels dropped, numbers parsed)."""
+    rows = []
+    for path, subject in DATASETS:
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                profile = {k: _coerce(v) for k, v in row.items() if k != TARGET and k not in DROP_COLS}
+                profile["subject"] = subject
+                rows.append(profile)
+    return rows[:limit] if limit else rows
+
+
+def load_base_split():
+    """Rebuild the notebook's train/test split so the hold-out set never moves."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    frames = []
+    for path, subject in DATASETS:
+        part = pd.read_csv(path, sep=";")
+        part["subject"] = subject
+        frames.append(part)
+    df = pd.concat(frames, ignore_index=True)
+
+    X = df.drop(columns=[TARGET] + DROP_COLS)
+    y = df[TARGET].astype(np.float32)
+    return train_test_split(X, y, test_size=0.2, random_state=SEED)
+
+
+def to_dense(x):
+    return x.toarray() if hasattr(x, "toarray") else x
@@ -0,0 +1,127 @@
+"""
+Uncertainty estimates for the ANN via batched Monte Carlo dropout.
+
+The model's Dropout(0.30/0.25) layers are kept ACTIVE at inference time and
+the input is tiled K times into one batch, so K stochastic forward passes
+cost a single call instead of K separate `model.predict` calls.
+BatchNormalization stays in inference mode (moving statistics), otherwise
+the K identical tiled rows would normalise each other away.
+
+Usage:
+    python uncertainty.py --k 50          # latency vs. one pass (K=1) and vs. model.predict
+"""
+import argparse
+import time
+import weakref
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+# Same pass/fail bands as the result card in app.py: [lower, upper)
+BANDS = {
+    "fail": (-np.inf, 10.0),
+    "mid": (10.0, 14.0),
+    "success": (14.0, np.inf),
+}
+DEFAULT_K = 50
+
+# Compiled stochastic forward pass per model id. The closure only holds a
+# weak reference, and the entry is dropped once the model is collected.
+_FORWARD_CACHE = {}
+
+
+def _stochastic_forward(model):
+    """Forward pass with only Dropout in training mode; cached per model."""
+    key = id(model)
+    fn = _FORWARD_CACHE.get(key)
+    if fn is None:
+        model_ref = weakref.ref(model)
+
+        @tf.function(reduce_retracing=True)
+        def fn(x):
+            h = x
+            for layer in model_ref().layers:
+                training = isinstance(layer, keras.layers.Dropout)
+                h = layer(h, training=training)
+            return h
+
+        _FORWARD_CACHE[key] = fn
+        weakref.finalize(model, _FORWARD_CACHE.pop, key, None)
+    return fn
+
+
+def mc_dropout_predict(model, x_p, k=DEFAULT_K):
+    """
+    Run K stochastic passes over every row of `x_p` in one tiled batch.
+
+    Returns a dict with per-row `mean`, `std` and `p_<band>` (share of the K
+    samples falling in each fail/mid/success band), plus the raw `samples`
+    array of shape (n_rows, K).
+    """
+    if k < 1:
+        raise ValueError("k must be >= 1")
+    x_p = x_p.toarray() if hasattr(x_p, "toarray") else x_p
+    x_p = np.asarray(x_p, dtype=np.float32)
+    n = x_p.shape[0]
+
+    # Row-major tiling: rows [i*K, (i+1)*K) are the K copies of row i, and
+    # each copy draws its own dropout mask.
+    tiled = np.repeat(x_p, k, axis=0)
+    samples = _stochastic_forward(model)(tf.constant(tiled)).numpy().reshape(n, k)
+
+    result = {
+        "mean": samples.mean(axis=1),
+        "std": samples.std(axis=1),
+        "samples": samples,
+    }
+    for band, (lo, hi) in BANDS.items():
+        result[f"p_{band}"] = ((samples >= lo) & (samples < hi)).mean(axis=1)
+    return result
+
+
+# -----------------------------------------------------------------------------
+# LATENCY BENCHMARK
+# -----------------------------------------------------------------------------
+def _time_ms(fn, repeats):
+    fn()  # warm-up / trace
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    import joblib
+    from student_data import MODEL_PATH, PREPROCESSOR_PATH, load_base_split, to_dense
+
+    parser = argparse.ArgumentParser(description="Benchmark batched MC-dropout latency.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 10, DEFAULT_K, 100])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    model = keras.models.load_model(MODEL_PATH)
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    _, X_test, _, _ = load_base_split()
+    x_one = to_dense(preprocessor.transform(X_test.iloc[:1])).astype(np.float32)
+
+    # Denominator: one pass through the same compiled forward, so the ratio
+    # shows only what the extra K-1 tiled rows cost.
+    single = _time_ms(lambda: mc_dropout_predict(model, x_one, k=1), args.repeats)
+    predict = _time_ms(lambda: model.predict(x_one, verbose=0), args.repeats)
+    print(f"single compiled forward (K=1):           {single:8.2f} ms")
+    print(f"single model.predict (app.py headline):  {predict:8.2f} ms")
+    print(f"{'K':>5}  {'batched MC ms':>13}  {'x K=1':>6}  {'x predict':>9}  {'K x predict ms':>14}")
+    for k in args.k:
+        batched = _time_ms(lambda: mc_dropout_predict(model, x_one, k=k), args.repeats)
+        # Naive alternative for comparison, timed on a few repeats only.
+        naive = _time_ms(
+            lambda: [model.predict(x_one, verbose=0) for _ in range(k)], max(1, args.repeats // 10)
+        )
+        print(f"{k:>5}  {batched:>13.2f}  {batched / single:>6.2f}  {batched / predict:>9.2f}  {naive:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()